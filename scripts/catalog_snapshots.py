@@ -0,0 +1,273 @@
+import glob
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# One directory per import date, one file per import:
+#   ../data/snapshots/date=2026-10-19/catalog-101500.123456.parquet
+# Snapshots record what the workbook contained. What the backend has accepted
+# is tracked separately in SYNCED_STATE_FILE so failed pushes don't rewrite history.
+SNAPSHOT_DIR = '../data/snapshots'
+SYNCED_STATE_FILE = os.path.join(SNAPSHOT_DIR, 'synced.parquet')
+SNAPSHOT_ID_FORMAT = '%Y-%m-%dT%H%M%S.%f'
+# Snapshots written before ids had microseconds: catalog-101500.parquet
+LEGACY_ID_FORMAT = '%Y-%m-%dT%H%M%S'
+
+# Names repeat across every snapshot, so store them dictionary-encoded and keep
+# money as integer cents / basis points to make equality checks exact
+SNAPSHOT_SCHEMA = pa.schema([
+    ('name_key', pa.dictionary(pa.int32(), pa.string())),
+    ('name', pa.dictionary(pa.int32(), pa.string())),
+    ('price_cents', pa.int64()),
+    ('discount_bp', pa.int32()),
+    ('stock', pa.int32()),
+])
+VALUE_COLUMNS = ['price_cents', 'discount_bp', 'stock']
+
+
+def snapshot_path(snapshot_id):
+    taken_at = datetime.strptime(snapshot_id, SNAPSHOT_ID_FORMAT)
+    day_dir = os.path.join(SNAPSHOT_DIR, f'date={taken_at:%Y-%m-%d}')
+    path = os.path.join(day_dir, f'catalog-{taken_at:%H%M%S.%f}.parquet')
+    if taken_at.microsecond == 0 and not os.path.exists(path):
+        legacy_path = os.path.join(day_dir, f'catalog-{taken_at:%H%M%S}.parquet')
+        if os.path.exists(legacy_path):
+            return legacy_path
+    return path
+
+
+def parse_snapshot_file(path):
+    """Return the snapshot id for a catalog file, or None if the name isn't one of ours."""
+    day = os.path.basename(os.path.dirname(path))[len('date='):]
+    clock = os.path.basename(path)[len('catalog-'):-len('.parquet')]
+    for id_format in (SNAPSHOT_ID_FORMAT, LEGACY_ID_FORMAT):
+        try:
+            taken_at = datetime.strptime(f'{day}T{clock}', id_format)
+        except ValueError:
+            continue
+        return taken_at.strftime(SNAPSHOT_ID_FORMAT)
+    return None
+
+
+def list_snapshots(start=None, end=None):
+    """Return snapshot ids in chronological order, optionally within [start, end].
+
+    Bounds may be any prefix of an id, so end='2026-10-19' includes that whole day.
+    """
+    ids = []
+    for path in glob.glob(os.path.join(SNAPSHOT_DIR, 'date=*', 'catalog-*.parquet')):
+        snapshot_id = parse_snapshot_file(path)
+        # Empty files are names reserved by a save_snapshot() that is still writing
+        if snapshot_id is None or os.path.getsize(path) == 0:
+            continue
+        ids.append(snapshot_id)
+    ids.sort()
+    if start is not None:
+        ids = [i for i in ids if i >= start]
+    if end is not None:
+        ids = [i for i in ids if i[:len(end)] <= end]
+    return ids
+
+
+def latest_snapshot():
+    ids = list_snapshots()
+    return ids[-1] if ids else None
+
+
+def records_to_frame(records):
+    """Convert build_catalog_records() output into the compact snapshot columns."""
+    df = pd.DataFrame.from_dict(records, orient='index')
+    if df.empty:
+        df = pd.DataFrame(columns=['name', 'price', 'discount', 'stock'])
+    df.index.name = 'name_key'
+    df = df.reset_index()
+    return pd.DataFrame({
+        'name_key': df['name_key'].astype(str),
+        'name': df['name'].astype(str),
+        'price_cents': (df['price'].astype(float) * 100).round().astype('int64'),
+        'discount_bp': (df['discount'].astype(float) * 100).round().astype('int32'),
+        'stock': df['stock'].astype('int32'),
+    })
+
+
+def frame_to_records(df):
+    """Inverse of records_to_frame(), for callers that work with plain dicts."""
+    return {
+        row.name_key: {
+            'name': row.name,
+            'price': row.price_cents / 100,
+            'discount': row.discount_bp / 100,
+            'stock': int(row.stock),
+        }
+        for row in df.itertuples(index=False)
+    }
+
+
+def write_records(records, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(records_to_frame(records), schema=SNAPSHOT_SCHEMA, preserve_index=False)
+    # Unique temp name per writer, so concurrent writes never share a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def reserve_snapshot_id(taken_at):
+    # O_EXCL makes claiming the name atomic, so two processes saving in the
+    # same microsecond get different ids instead of overwriting each other
+    while True:
+        snapshot_id = taken_at.strftime(SNAPSHOT_ID_FORMAT)
+        path = snapshot_path(snapshot_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            taken_at += timedelta(microseconds=1)
+            continue
+        return snapshot_id
+
+
+def save_snapshot(records, taken_at=None):
+    """Write one import as a Parquet snapshot and return its id."""
+    snapshot_id = reserve_snapshot_id(taken_at or datetime.now())
+    path = snapshot_path(snapshot_id)
+    try:
+        write_records(records, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return snapshot_id
+
+
+def read_frame(path):
+    df = pq.read_table(path).to_pandas()
+    df['name_key'] = df['name_key'].astype(str)
+    df['name'] = df['name'].astype(str)
+    return df
+
+
+def load_snapshot(snapshot_id):
+    return read_frame(snapshot_path(snapshot_id))
+
+
+def save_synced_state(records):
+    """Record the catalog values the backend currently holds."""
+    write_records(records, SYNCED_STATE_FILE)
+
+
+def load_synced_state():
+    if not os.path.exists(SYNCED_STATE_FILE):
+        return None
+    return read_frame(SYNCED_STATE_FILE)
+
+
+def load_history(start=None, end=None):
+    """Stack every snapshot in range into one frame with a `snapshot_id` column."""
+    frames = []
+    for snapshot_id in list_snapshots(start, end):
+        df = load_snapshot(snapshot_id)
+        df['snapshot_id'] = snapshot_id
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['name_key', 'name', *VALUE_COLUMNS, 'snapshot_id'])
+    history = pd.concat(frames, ignore_index=True)
+    history['name_key'] = history['name_key'].astype('category')
+    return history.sort_values(['name_key', 'snapshot_id'], ignore_index=True)
+
+
+def diff_frames(old, new):
+    """Row-level diff of two snapshot frames.
+
+    Returns one row per product that was added, removed or changed, with the
+    old and new value columns side by side and a `status` column.
+    """
+    merged = old.merge(new, on='name_key', how='outer', suffixes=('_old', '_new'), indicator=True)
+    changed = pd.Series(False, index=merged.index)
+    for column in VALUE_COLUMNS:
+        changed |= merged[f'{column}_old'] != merged[f'{column}_new']
+    merged['status'] = 'changed'
+    merged.loc[merged['_merge'] == 'left_only', 'status'] = 'removed'
+    merged.loc[merged['_merge'] == 'right_only', 'status'] = 'added'
+    merged = merged[(merged['_merge'] != 'both') | changed]
+    merged['name'] = merged['name_new'].fillna(merged['name_old'])
+    columns = ['name_key', 'name', 'status']
+    columns += [f'{column}_{side}' for column in VALUE_COLUMNS for side in ('old', 'new')]
+    merged = merged[columns].sort_values('name_key', ignore_index=True)
+    # Outer-join gaps turned the integer columns into floats; keep them integral
+    value_columns = columns[3:]
+    merged[value_columns] = merged[value_columns].astype('Int64')
+    return merged
+
+
+def diff_snapshots(old_id, new_id):
+    return diff_frames(load_snapshot(old_id), load_snapshot(new_id))
+
+
+def price_change_series(start=None, end=None, name_keys=None):
+    """Every price or discount change per product across the snapshots in range."""
+    history = load_history(start, end)
+    if name_keys is not None:
+        history = history[history['name_key'].isin(name_keys)]
+    grouped = history.groupby('name_key', observed=True)
+    history['prev_price_cents'] = grouped['price_cents'].shift()
+    history['prev_discount_bp'] = grouped['discount_bp'].shift()
+    changed = history['prev_price_cents'].notna() & (
+        (history['price_cents'] != history['prev_price_cents'])
+        | (history['discount_bp'] != history['prev_discount_bp'])
+    )
+    series = history.loc[changed, [
+        'name_key', 'name', 'snapshot_id', 'prev_price_cents', 'price_cents',
+        'prev_discount_bp', 'discount_bp',
+    ]].reset_index(drop=True)
+    series['prev_price_cents'] = series['prev_price_cents'].astype('int64')
+    series['prev_discount_bp'] = series['prev_discount_bp'].astype('int32')
+    return series
+
+
+def stockout_periods(start=None, end=None):
+    """Contiguous runs of snapshots where a product had zero stock.
+
+    A snapshot the product is missing from ends the run. `restocked_at` is the
+    first snapshot with stock again and `removed_at` the first one without the
+    product; both are NaN while it is still out of stock in the last
+    snapshot of the range.
+    """
+    snapshot_ids = list_snapshots(start, end)
+    history = load_history(start, end)
+    history = history[history['snapshot_id'].isin(snapshot_ids)]
+    history['name_key'] = history['name_key'].astype(str)
+    # One row per product per snapshot so gaps show up as NaN stock
+    full_index = pd.MultiIndex.from_product(
+        [sorted(history['name_key'].unique()), snapshot_ids], names=['name_key', 'snapshot_id']
+    )
+    grid = history.set_index(['name_key', 'snapshot_id']).reindex(full_index).reset_index()
+    present = grid['stock'].notna()
+    out = present & (grid['stock'] <= 0)
+    by_product = grid['name_key']
+    # A new run starts whenever the out-of-stock flag flips within a product
+    run_id = (out != out.groupby(by_product).shift(fill_value=False)).groupby(by_product).cumsum()
+    grid['run_id'] = run_id
+    # groupby().last() skips NaN, so mark "still out" with '' until after the agg
+    grid['ended_at'] = grid.groupby('name_key')['snapshot_id'].shift(-1).fillna('')
+    grid['restocked'] = present.groupby(by_product).shift(-1, fill_value=False)
+    runs = grid[out].groupby(['name_key', 'run_id']).agg(
+        name=('name', 'first'),
+        out_of_stock_from=('snapshot_id', 'first'),
+        last_seen_out=('snapshot_id', 'last'),
+        ended_at=('ended_at', 'last'),
+        restocked=('restocked', 'last'),
+        snapshots=('snapshot_id', 'size'),
+    )
+    ended = runs['ended_at'] != ''
+    runs['restocked_at'] = runs['ended_at'].where(ended & runs['restocked'], None)
+    runs['removed_at'] = runs['ended_at'].where(ended & ~runs['restocked'], None)
+    return runs.reset_index().drop(columns=['run_id', 'ended_at', 'restocked'])
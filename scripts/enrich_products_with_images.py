@@ -28,6 +28,8 @@ REQUIRED_COLS = [
 
 # Add this at the top of the script
 DEFAULT_IMAGE_URL = "https://via.placeholder.com/400x400?text=No+Image"
+# Fuzzy matches scoring below this are treated as unreliable
+LOW_CONFIDENCE_SCORE = 60
 
 
 def check_prerequisites():
@@ -76,6 +78,22 @@ def load_external_dataset():
     return df
 
 
+def build_match_index(external_df):
+    # Keep the choice list and image lookup in memory so repeated matches
+    # (e.g. from the warm worker) don't rebuild them per product
+    return {
+        'names': external_df['product_name'].tolist(),
+        'image_urls': external_df['image_url'].tolist(),
+    }
+
+
+def match_product_name(name, index):
+    match, score, match_idx = process.extractOne(
+        name, index['names'], scorer=fuzz.token_sort_ratio
+    )
+    return match, score, index['image_urls'][match_idx]
+
+
 def map_columns(df):
     col_map = {}
     for required in REQUIRED_COLS:
@@ -158,9 +176,10 @@ def load_products():
     return df
 
 
-def enrich_products(products_df, external_df):
+def enrich_products(products_df, external_df, index=None):
     print('Fuzzy matching and enriching...')
-    external_names = external_df['product_name'].tolist()
+    if index is None:
+        index = build_match_index(external_df)
     image_urls = []
     match_scores = []
     match_names = []
@@ -173,10 +192,7 @@ def enrich_products(products_df, external_df):
             match_names.append('')
             print(f'[NO NAME] Row {idx} skipped.')
             continue
-        match, score, match_idx = process.extractOne(
-            name, external_names, scorer=fuzz.token_sort_ratio
-        )
-        image_url = external_df.iloc[match_idx]['image_url']
+        match, score, image_url = match_product_name(name, index)
         # Only assign if image_url is not invalid
         if '/invalid/' in str(image_url) or not str(image_url).strip():
             image_urls.append([])
@@ -186,7 +202,7 @@ def enrich_products(products_df, external_df):
             print(f'[MATCH] {name} → {match} (score: {score}) | Image: {image_url}')
         match_scores.append(score)
         match_names.append(match)
-        if score < 60 or '/invalid/' in str(image_url) or not str(image_url).strip():
+        if score < LOW_CONFIDENCE_SCORE or '/invalid/' in str(image_url) or not str(image_url).strip():
             low_confidence_rows.append({
                 'name': name,
                 'matched_name': match,
@@ -233,7 +249,7 @@ def is_valid_uuid(val):
     return bool(re.match(r'^[0-9a-fA-F-]{36}$', val))
 
 
-def save_enriched(products_df):
+def save_enriched(products_df, output_path=ENRICHED_XLSX):
     # Try to find the name column (case-insensitive, common variants)
     possible_names = ['name', 'Name', 'product_name', 'Product Name', 'product', 'Product']
     found = None
@@ -260,8 +276,8 @@ def save_enriched(products_df):
     products_df['discount'] = pd.to_numeric(products_df['discount'], errors='coerce').fillna(0.0)
     products_df = products_df[products_df['price'].notnull() & products_df['stock'].notnull()]
     # Validate UUIDs
-    products_df = products_df[products_df['category_id'].apply(is_valid_uuid)]
-    products_df = products_df[products_df['created_by'].apply(is_valid_uuid)]
+    products_df = products_df[products_df['category_id'].map(is_valid_uuid).astype(bool)]
+    products_df = products_df[products_df['created_by'].map(is_valid_uuid).astype(bool)]
     after = len(products_df)
     print(f"Filtered out {before - after} rows due to missing/invalid required fields.")
     print('Sample row for upload:')
@@ -290,20 +306,21 @@ def save_enriched(products_df):
     if 'is_active' in products_df.columns:
         print('Unique values for is_active:', products_df['is_active'].unique())
 
-    print(f'Saving enriched file to {ENRICHED_XLSX}')
-    products_df.to_excel(ENRICHED_XLSX, index=False)
+    print(f'Saving enriched file to {output_path}')
+    products_df.to_excel(output_path, index=False)
     print('Done!')
 
     # Save a single-row test file for manual backend testing if needed
-    single_row_file = ENRICHED_XLSX.replace('.xlsx', '_single_row.xlsx')
+    single_row_file = output_path.replace('.xlsx', '_single_row.xlsx')
     products_df.head(1).to_excel(single_row_file, index=False)
     print(f'Saved single-row test file to {single_row_file}')
+    return products_df
 
 
-def upload_to_backend():
-    print(f'Uploading {ENRICHED_XLSX} to backend...')
-    with open(ENRICHED_XLSX, 'rb') as f:
-        files = {'file': (os.path.basename(ENRICHED_XLSX), f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+def upload_to_backend(path=ENRICHED_XLSX):
+    print(f'Uploading {path} to backend...')
+    with open(path, 'rb') as f:
+        files = {'file': (os.path.basename(path), f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
         headers = {'Authorization': f'Bearer {ADMIN_TOKEN}'}
         response = requests.post(BACKEND_URL, files=files, headers=headers)
         print('Backend response:', response.status_code, response.text)
@@ -15,21 +15,24 @@ REVIEW_FILE = '../data/products_images_manual_review.csv'
 # Google Custom Search API endpoint
 SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
 
-# Automatically detect the header row containing 'Product Name'
-preview = pd.read_excel(INPUT_FILE, header=None, nrows=20)
-header_row_idx = None
-for i, row in preview.iterrows():
-    if any(isinstance(cell, str) and 'Product Name' in cell for cell in row):
-        header_row_idx = i
-        break
-if header_row_idx is None:
-    raise Exception('Could not find a header row containing "Product Name".')
-
-# Read the file using the detected header row
-print(f"Detected header row at Excel row {header_row_idx+1}")
-df = pd.read_excel(INPUT_FILE, header=header_row_idx)
-if 'Product Name' not in df.columns:
-    raise Exception('Input file must have a "Product Name" column for product names.')
+
+def load_input_products(input_file=INPUT_FILE):
+    # Automatically detect the header row containing 'Product Name'
+    preview = pd.read_excel(input_file, header=None, nrows=20)
+    header_row_idx = None
+    for i, row in preview.iterrows():
+        if any(isinstance(cell, str) and 'Product Name' in cell for cell in row):
+            header_row_idx = i
+            break
+    if header_row_idx is None:
+        raise Exception('Could not find a header row containing "Product Name".')
+
+    # Read the file using the detected header row
+    print(f"Detected header row at Excel row {header_row_idx+1}")
+    df = pd.read_excel(input_file, header=header_row_idx)
+    if 'Product Name' not in df.columns:
+        raise Exception('Input file must have a "Product Name" column for product names.')
+    return df
 
 
 def fetch_image_url(query):
@@ -56,35 +59,46 @@ def fetch_image_url(query):
     return None
 
 
-image_urls = []
-image_sources = []
-for idx, row in df.iterrows():
-    product_name = str(row['Product Name'])
-    image_url = fetch_image_url(product_name)
-    if image_url:
-        image_urls.append([image_url])
-        image_sources.append('google')
-    else:
-        image_urls.append([DEFAULT_IMAGE_URL])
-        image_sources.append('fallback')
-    # Respect Google API rate limits
-    time.sleep(1)
-
-df['images'] = image_urls
-df['image_source'] = image_sources
-
-dataset_count = image_sources.count('google')
-fallback_count = image_sources.count('fallback')
-print(f"Products with Google images: {dataset_count}")
-print(f"Products with fallback images: {fallback_count}")
-
-# Save enriched file
-print(f"Saving enriched file to {OUTPUT_FILE}")
-df.to_excel(OUTPUT_FILE, index=False)
-
-# Save manual review file for fallback images
-review_df = df[df['image_source'] == 'fallback'][['Product Name', 'images']]
-review_df.to_csv(REVIEW_FILE, index=False)
-print(f"Saved manual review file to {REVIEW_FILE}")
-
-print("Done!") 
+def add_google_images(df):
+    image_urls = []
+    image_sources = []
+    for idx, row in df.iterrows():
+        product_name = str(row['Product Name'])
+        image_url = fetch_image_url(product_name)
+        if image_url:
+            image_urls.append([image_url])
+            image_sources.append('google')
+        else:
+            image_urls.append([DEFAULT_IMAGE_URL])
+            image_sources.append('fallback')
+        # Respect Google API rate limits
+        time.sleep(1)
+
+    df['images'] = image_urls
+    df['image_source'] = image_sources
+
+    dataset_count = image_sources.count('google')
+    fallback_count = image_sources.count('fallback')
+    print(f"Products with Google images: {dataset_count}")
+    print(f"Products with fallback images: {fallback_count}")
+    return df
+
+
+def main():
+    df = load_input_products()
+    df = add_google_images(df)
+
+    # Save enriched file
+    print(f"Saving enriched file to {OUTPUT_FILE}")
+    df.to_excel(OUTPUT_FILE, index=False)
+
+    # Save manual review file for fallback images
+    review_df = df[df['image_source'] == 'fallback'][['Product Name', 'images']]
+    review_df.to_csv(REVIEW_FILE, index=False)
+    print(f"Saved manual review file to {REVIEW_FILE}")
+
+    print("Done!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+import argparse
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openpyxl
+import requests
+
+import upload_products_to_backend as upload
+
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16, 32]
+DEFAULT_PAGE_SIZES = [10, 100]
+DEFAULT_BATCH_SIZES = [10, 100]
+# Approximate PUT body sizes in bytes; the padding goes into `description`
+DEFAULT_PAYLOAD_SIZES = [200, 10000]
+# Doubling concurrency must add at least this much throughput to count as scaling
+KNEE_MIN_GAIN = 0.10
+KNEE_MAX_ERROR_RATE = 0.01
+STUB_HOST = '127.0.0.1'
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+LOAD_TEST_NAME_PREFIX = 'Load Test Product'
+RESTORE_FIELDS = ['description', 'price', 'discount', 'stock']
+BULK_COLUMNS = ['name', 'description', 'price', 'discount', 'stock', 'images', 'isOutOfStock', 'isActive', 'categoryId']
+
+
+# --- Stub backend -----------------------------------------------------------
+
+class StubBackend:
+    """In-memory stand-in for the product routes used by the scripts.
+
+    `capacity` bounds how many requests are served at once and `latency_ms`
+    is the time each one holds a slot, so the stub saturates like a backend
+    with a small database pool instead of scaling forever.
+    """
+
+    def __init__(self, products=1000, capacity=4, latency_ms=5.0):
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(capacity)
+        self.latency = latency_ms / 1000.0
+        self.products = {}
+        for i in range(products):
+            self.add_product({'name': f'Stub Product {i}', 'price': 10.0 + i % 90, 'stock': i % 20})
+
+    def add_product(self, fields):
+        product = {
+            'id': str(uuid.uuid4()),
+            'name': fields.get('name'),
+            'description': fields.get('description') or '',
+            'price': float(fields.get('price') or 0),
+            'discount': float(fields.get('discount') or 0),
+            'stock': int(fields.get('stock') or 0),
+            'images': [],
+            'isOutOfStock': not fields.get('stock'),
+            'isActive': True,
+            'categoryId': fields.get('categoryId') or upload.DEFAULT_CATEGORY_ID,
+        }
+        with self.lock:
+            self.products[product['id']] = product
+        return product
+
+    def list_products(self, page, limit):
+        with self.lock:
+            active = [p for p in self.products.values() if p['isActive']]
+        start = (page - 1) * limit
+        return {
+            'products': active[start:start + limit],
+            'totalProducts': len(active),
+            'currentPage': page,
+            'totalPages': -(-len(active) // limit),
+        }
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY every
+    # keep-alive response stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
+    product_path = re.compile(r'^/api/products/([0-9a-fA-F-]{36})$')
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def handle_route(self, method):
+        backend = self.server.backend
+        body = self.read_body()
+        with backend.slots:
+            time.sleep(backend.latency)
+            path, _, query = self.path.partition('?')
+            params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+            if method == 'GET' and path in ('/', '/api/products'):
+                page = int(params.get('page', 1))
+                limit = int(params.get('limit', 10))
+                return self.send_json(200, backend.list_products(page, limit))
+            if method == 'POST' and path == '/api/products/bulk-upload':
+                rows = parse_bulk_upload(self.headers.get('Content-Type', ''), body)
+                if rows is None:
+                    return self.send_json(400, {'message': 'No file uploaded'})
+                for row in rows:
+                    backend.add_product(row)
+                return self.send_json(200, {'message': 'Products uploaded successfully', 'count': len(rows)})
+            match = self.product_path.match(path)
+            if match and method in ('GET', 'PUT', 'DELETE'):
+                with backend.lock:
+                    product = backend.products.get(match.group(1))
+                    if product is None:
+                        return self.send_json(404, {'message': 'Product not found'})
+                    if method == 'PUT':
+                        product.update(json.loads(body or b'{}'))
+                    elif method == 'DELETE':
+                        product['isActive'] = False
+                        return self.send_json(200, {'message': 'Product deleted successfully'})
+                    return self.send_json(200, dict(product))
+            return self.send_json(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        self.handle_route('GET')
+
+    def do_PUT(self):
+        self.handle_route('PUT')
+
+    def do_DELETE(self):
+        self.handle_route('DELETE')
+
+    def do_POST(self):
+        self.handle_route('POST')
+
+
+def parse_bulk_upload(content_type, body):
+    # Same multipart `file` field that multer reads in bulkUploadProducts
+    if not content_type.startswith('multipart/form-data'):
+        return None
+    message = BytesParser(policy=HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body
+    )
+    for part in message.iter_parts():
+        if part.get_param('name', header='content-disposition') == 'file':
+            ws = openpyxl.load_workbook(io.BytesIO(part.get_payload(decode=True))).active
+            rows = list(ws.iter_rows(values_only=True))
+            header = [str(cell) for cell in rows[0]] if rows else []
+            return [dict(zip(header, row)) for row in rows[1:]]
+    return None
+
+
+def start_stub_server(products=1000, capacity=4, latency_ms=5.0, port=0):
+    server = ThreadingHTTPServer((STUB_HOST, port), StubRequestHandler)
+    server.daemon_threads = True
+    server.backend = StubBackend(products, capacity, latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{STUB_HOST}:{server.server_address[1]}'
+
+
+# --- Request shapes ---------------------------------------------------------
+
+def build_bulk_upload_file(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(BULK_COLUMNS)
+    for i in range(rows):
+        ws.append([
+            f'{LOAD_TEST_NAME_PREFIX} {uuid.uuid4().hex[:12]}', 'load test', 10.0 + i % 90, 0.0,
+            i % 20, '', i % 20 == 0, True, upload.DEFAULT_CATEGORY_ID,
+        ])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+class ScenarioContext:
+    def __init__(self, base_url, token, products):
+        self.base_url = base_url
+        self.token = token
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.products = {p['id']: p for p in products}
+        self.product_ids = list(self.products)
+        self.deleted_ids = []
+        self.updated_ids = set()
+        self.local = threading.local()
+        self.counter = 0
+        self.counter_lock = threading.Lock()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+
+    def next_index(self):
+        with self.counter_lock:
+            self.counter += 1
+            return self.counter
+
+    def next_product_id(self):
+        return self.product_ids[self.next_index() % len(self.product_ids)]
+
+    def restore_deleted(self):
+        # The backend only sets isActive=false on DELETE, so undo it between levels
+        while self.deleted_ids:
+            prod_id = self.deleted_ids.pop()
+            self.session().put(f'{self.base_url}/api/products/{prod_id}', json={'isActive': True})
+
+    def restore_updated(self):
+        # Put back the fields update_request overwrote
+        while self.updated_ids:
+            prod_id = self.updated_ids.pop()
+            original = self.products[prod_id]
+            payload = {field: original.get(field) for field in RESTORE_FIELDS}
+            self.session().put(f'{self.base_url}/api/products/{prod_id}', json=payload)
+
+    def remove_uploaded(self):
+        # Bulk-upload creates real rows; soft-delete them so levels don't pile up
+        for product in upload.fetch_all_products(self.base_url, self.token):
+            if str(product['name']).startswith(LOAD_TEST_NAME_PREFIX):
+                self.session().delete(f'{self.base_url}/api/products/{product["id"]}')
+
+
+def list_request(ctx, size):
+    page = (ctx.next_index() % 5) + 1
+    return ctx.session().get(f'{ctx.base_url}/api/products', params={'page': page, 'limit': size})
+
+
+def update_request(ctx, size):
+    prod_id = ctx.next_product_id()
+    ctx.updated_ids.add(prod_id)
+    payload = {'price': 10.0 + size % 90, 'discount': 0.0, 'stock': size % 20, 'description': ''}
+    payload['description'] = 'x' * max(0, size - len(json.dumps(payload)))
+    return ctx.session().put(f'{ctx.base_url}/api/products/{prod_id}', json=payload)
+
+
+def delete_request(ctx, size):
+    prod_id = ctx.next_product_id()
+    ctx.deleted_ids.append(prod_id)
+    return ctx.session().delete(f'{ctx.base_url}/api/products/{prod_id}')
+
+
+def bulk_upload_request(ctx, size):
+    files = {'file': ('load_test.xlsx', ctx.bulk_files[size], XLSX_MIME)}
+    return ctx.session().post(f'{ctx.base_url}/api/products/bulk-upload', files=files)
+
+
+SCENARIOS = {
+    'list': list_request,
+    'update': update_request,
+    'delete': delete_request,
+    'bulk-upload': bulk_upload_request,
+}
+
+
+# --- Measurement ------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def timed_call(request_fn, ctx, size):
+    start = time.perf_counter()
+    try:
+        resp = request_fn(ctx, size)
+        ok = 200 <= resp.status_code < 300
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_level(scenario, ctx, size, concurrency, requests_per_level):
+    request_fn = SCENARIOS[scenario]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: timed_call(request_fn, ctx, size), range(requests_per_level)))
+    wall = time.perf_counter() - start
+    # Undo the level's writes outside the timed window
+    ctx.restore_deleted()
+    ctx.restore_updated()
+    if scenario == 'bulk-upload':
+        ctx.remove_uploaded()
+    latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        'scenario': scenario,
+        'size': size,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results) if results else 0.0,
+        'throughput_rps': len(results) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p90_ms': percentile(latencies, 90),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+
+def find_knee(levels):
+    """Return the last level where raising concurrency still paid off.
+
+    `levels` is one scenario/size curve ordered by concurrency. The knee is
+    the first point whose successor adds less than KNEE_MIN_GAIN throughput
+    or pushes the error rate past KNEE_MAX_ERROR_RATE.
+    """
+    if not levels:
+        return None
+    for current, following in zip(levels, levels[1:]):
+        if following['error_rate'] > KNEE_MAX_ERROR_RATE:
+            return current
+        if following['throughput_rps'] < current['throughput_rps'] * (1 + KNEE_MIN_GAIN):
+            return current
+    return levels[-1]
+
+
+def run_load_test(base_url, token, scenarios, concurrency_levels, page_sizes, batch_sizes, payload_sizes,
+                  requests_per_level):
+    products = upload.fetch_all_products(base_url, token)
+    if not products and any(s in ('update', 'delete') for s in scenarios):
+        raise RuntimeError(f'No products at {base_url}/api/products to update or delete.')
+    ctx = ScenarioContext(base_url, token, products)
+    ctx.bulk_files = {size: build_bulk_upload_file(size) for size in batch_sizes}
+    results = []
+    knees = []
+    for scenario in scenarios:
+        sizes = {'list': page_sizes, 'update': payload_sizes, 'bulk-upload': batch_sizes}.get(scenario, [1])
+        for size in sizes:
+            curve = []
+            for concurrency in concurrency_levels:
+                level = run_level(scenario, ctx, size, concurrency, requests_per_level)
+                print(
+                    f"{scenario:<12} size={size:<5} c={concurrency:<3} "
+                    f"{level['throughput_rps']:8.1f} req/s  p50={level['p50_ms']:7.1f}ms "
+                    f"p95={level['p95_ms']:7.1f}ms p99={level['p99_ms']:7.1f}ms "
+                    f"errors={level['error_rate']:.1%}"
+                )
+                curve.append(level)
+            results.extend(curve)
+            knee = find_knee(curve)
+            knees.append(knee)
+            print(
+                f"  knee: {scenario} size={size} at concurrency {knee['concurrency']} "
+                f"({knee['throughput_rps']:.1f} req/s, p95 {knee['p95_ms']:.1f}ms)"
+            )
+    return {'results': results, 'knees': knees}
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the product endpoints used by the sync scripts.')
+    parser.add_argument('--base-url', default=upload.BACKEND_BASE_URL)
+    parser.add_argument('--stub', action='store_true', help='Run against a bundled in-memory stub backend')
+    parser.add_argument('--stub-products', type=int, default=1000)
+    parser.add_argument('--stub-capacity', type=int, default=4)
+    parser.add_argument('--stub-latency-ms', type=float, default=5.0)
+    parser.add_argument('--scenarios', default='list,update',
+                        help=f'Comma-separated from {",".join(SCENARIOS)}; delete and bulk-upload write to the backend')
+    parser.add_argument('--concurrency', type=parse_int_list, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--page-sizes', type=parse_int_list, default=DEFAULT_PAGE_SIZES)
+    parser.add_argument('--batch-sizes', type=parse_int_list, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--payload-sizes', type=parse_int_list, default=DEFAULT_PAYLOAD_SIZES,
+                        help='Approximate update body sizes in bytes')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--json', help='Write all measurements to this file')
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f'Unknown scenarios: {", ".join(unknown)}')
+
+    server = None
+    base_url = args.base_url
+    if args.stub:
+        server, base_url = start_stub_server(args.stub_products, args.stub_capacity, args.stub_latency_ms)
+        print(f'Stub backend listening on {base_url}')
+    try:
+        report = run_load_test(
+            base_url, upload.ADMIN_TOKEN, scenarios, args.concurrency,
+            args.page_sizes, args.batch_sizes, args.payload_sizes, args.requests
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote measurements to {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import requests
+
+import enrich_products_with_images as enrich
+import upload_products_to_backend as upload
+
+# Local-only job socket; one JSON object per line in, one JSON object per line out
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = int(os.environ.get('PIPELINE_WORKER_PORT', '8765'))
+SYNC_UPLOAD_XLSX = '../data/products_sync_upload.xlsx'
+
+
+class PipelineState:
+    """Dataset, match index and products kept warm between jobs."""
+
+    def __init__(self):
+        # Serializes jobs that read or write the shared workbooks
+        self.lock = threading.Lock()
+        self.external_df = None
+        self.index = None
+        self.products_df = None
+        self.products_mtime = None
+
+    def load_dataset(self):
+        enrich.download_dataset()
+        self.external_df = enrich.load_external_dataset()
+        self.index = enrich.build_match_index(self.external_df)
+        print(f'Match index ready with {len(self.index["names"])} dataset products.')
+
+    def products(self):
+        # Only re-parse products.xlsx when it changed on disk
+        mtime = os.path.getmtime(enrich.PRODUCTS_XLSX)
+        if self.products_df is None or mtime != self.products_mtime:
+            self.products_df = enrich.load_products()
+            self.products_mtime = mtime
+        return self.products_df.copy()
+
+
+def handle_match(state, job):
+    name = str(job.get('name') or '').strip()
+    if not name:
+        raise ValueError('match job requires a non-empty "name"')
+    match, score, image_url = enrich.match_product_name(name, state.index)
+    low_confidence = score < enrich.LOW_CONFIDENCE_SCORE
+    valid = not low_confidence and bool(str(image_url).strip()) and '/invalid/' not in str(image_url)
+    return {
+        'name': name,
+        'matched_name': match,
+        'score': score,
+        'low_confidence': low_confidence,
+        'image_url': image_url if valid else enrich.DEFAULT_IMAGE_URL,
+        'image_source': 'dataset' if valid else 'fallback',
+    }
+
+
+def handle_enrich(state, job):
+    with state.lock:
+        enriched_df = enrich.enrich_products(state.products(), state.external_df, state.index)
+        enrich.save_enriched(enriched_df)
+    return {'products': len(enriched_df), 'output': enrich.ENRICHED_XLSX}
+
+
+def handle_sync(state, job):
+    # Upsert by name: existing products only get their images updated, ones we
+    # soft-deleted are reactivated, and just the rest are bulk-created, so
+    # repeated syncs never duplicate
+    with state.lock:
+        products_df = state.products()
+        name = str(job.get('name') or '').strip()
+        if name:
+            products_df = products_df[products_df['name'].astype(str).str.strip().str.lower() == name.lower()]
+            if products_df.empty:
+                raise ValueError(f'No product named {name!r} in {enrich.PRODUCTS_XLSX}')
+        enriched_df = enrich.enrich_products(products_df, state.external_df, state.index)
+        backend_ids = {
+            str(p['name']).strip().lower(): p['id']
+            for p in upload.fetch_all_products(upload.BACKEND_BASE_URL, upload.ADMIN_TOKEN)
+        }
+        deactivated = upload.load_deactivated_ids()
+        name_keys = enriched_df['name'].astype(str).str.strip().str.lower()
+        known = name_keys.isin(backend_ids) | name_keys.isin(deactivated)
+        updated, failed = 0, []
+        for key, images in zip(name_keys[known], enriched_df.loc[known, 'images']):
+            payload = {'images': images}
+            if key in backend_ids:
+                prod_id = backend_ids[key]
+            else:
+                prod_id = deactivated[key]
+                payload['isActive'] = True
+            resp = requests.put(
+                f'{upload.BACKEND_BASE_URL}/api/products/{prod_id}',
+                json=payload,
+                headers=upload.headers
+            )
+            if resp.status_code == 200:
+                updated += 1
+                deactivated.pop(key, None)
+            else:
+                failed.append(key)
+                print(f'Failed to update images for {key} (id={prod_id}): {resp.status_code} {resp.text}')
+        upload.save_deactivated_ids(deactivated)
+        created = 0
+        if (~known).any():
+            # save_enriched drops rows that fail validation; those count as failed
+            new_df = enrich.save_enriched(enriched_df[~known], SYNC_UPLOAD_XLSX)
+            kept = set(new_df['name'].astype(str).str.strip().str.lower())
+            dropped = [key for key in name_keys[~known] if key not in kept]
+            if dropped:
+                print(f'{len(dropped)} products failed validation and were not uploaded.')
+                failed.extend(dropped)
+            if kept:
+                if upload.bulk_upload_file(SYNC_UPLOAD_XLSX):
+                    created = len(new_df)
+                else:
+                    failed.extend(sorted(kept))
+    if name and failed:
+        raise ValueError(f'Could not sync {name!r}; see the worker log for details')
+    return {'products': len(enriched_df), 'updated': updated, 'created': created, 'failed': len(failed), 'failed_names': failed}
+
+
+def handle_reload(state, job):
+    with state.lock:
+        state.load_dataset()
+        state.products_df = None
+    return {'dataset_products': len(state.index['names'])}
+
+
+JOB_HANDLERS = {
+    'ping': lambda state, job: {},
+    'match': handle_match,
+    'enrich': handle_enrich,
+    'sync': handle_sync,
+    'reload': handle_reload,
+}
+
+
+def run_job(state, job):
+    start = time.perf_counter()
+    if not isinstance(job, dict):
+        return {'ok': False, 'error': f'Job must be a JSON object, got {type(job).__name__}'}
+    handler = JOB_HANDLERS.get(job.get('job'))
+    if handler is None:
+        return {'ok': False, 'error': f'Unknown job: {job.get("job")!r}'}
+    try:
+        result = handler(state, job)
+    except Exception as e:
+        print(f'Job {job.get("job")} failed: {e}')
+        return {'ok': False, 'error': str(e)}
+    result['ok'] = True
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+class JobRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                response = {'ok': False, 'error': f'Invalid JSON: {e}'}
+            else:
+                response = run_job(self.server.state, job)
+            self.wfile.write((json.dumps(response, default=str) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class PipelineWorkerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, state, host=WORKER_HOST, port=WORKER_PORT):
+        self.state = state
+        super().__init__((host, port), JobRequestHandler)
+
+
+def submit_job(job, host=WORKER_HOST, port=WORKER_PORT, timeout=600):
+    """Send one job to a running worker and return its decoded response."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(job) + '\n').encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+
+
+def serve():
+    state = PipelineState()
+    state.load_dataset()
+    with PipelineWorkerServer(state) as server:
+        print(f'Pipeline worker listening on {WORKER_HOST}:{WORKER_PORT}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print('Shutting down pipeline worker.')
+
+
+def main():
+    # `python pipeline_worker.py` serves; `python pipeline_worker.py <job> [name]` submits
+    if len(sys.argv) < 2 or sys.argv[1] == 'serve':
+        serve()
+        return
+    job = {'job': sys.argv[1]}
+    if len(sys.argv) > 2:
+        job['name'] = ' '.join(sys.argv[2:])
+    print(json.dumps(submit_job(job), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import catalog_snapshots as snapshots
+
+
+def record(name, price, discount=0.0, stock=5):
+    return {'name': name, 'price': price, 'discount': discount, 'stock': stock}
+
+
+def catalog(*records):
+    return {r['name'].lower(): r for r in records}
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def save_at(records, when):
+    return snapshots.save_snapshot(records, datetime.fromisoformat(when))
+
+
+def test_diff_frames_reports_added_removed_and_changed():
+    old = snapshots.records_to_frame(catalog(record('Tea', 10.0), record('Rice', 50.0), record('Salt', 5.0)))
+    new = snapshots.records_to_frame(catalog(record('Tea', 12.5), record('Rice', 50.0), record('Milk', 3.0)))
+    diff = snapshots.diff_frames(old, new).set_index('name_key')
+    assert diff['status'].to_dict() == {'milk': 'added', 'salt': 'removed', 'tea': 'changed'}
+    assert diff.loc['tea', 'price_cents_old'] == 1000
+    assert diff.loc['tea', 'price_cents_new'] == 1250
+
+
+def test_save_snapshot_never_reuses_an_id(snapshot_dir):
+    first = save_at(catalog(record('Tea', 10.0)), '2026-10-19T10:15:00')
+    second = save_at(catalog(record('Tea', 11.0)), '2026-10-19T10:15:00')
+    assert first != second
+    assert snapshots.list_snapshots() == [first, second]
+    assert not list(snapshot_dir.rglob('*.tmp'))
+
+
+def test_list_snapshots_reads_legacy_names_and_skips_unknown_ones(snapshot_dir):
+    save_at(catalog(record('Tea', 10.0)), '2026-10-19T10:15:00.500000')
+    day_dir = snapshot_dir / 'date=2026-10-19'
+    snapshots.write_records(catalog(record('Tea', 9.0)), str(day_dir / 'catalog-090000.parquet'))
+    (day_dir / 'catalog-backup.parquet').write_bytes(b'junk')
+    assert snapshots.list_snapshots() == ['2026-10-19T090000.000000', '2026-10-19T101500.500000']
+    assert snapshots.load_snapshot('2026-10-19T090000.000000')['price_cents'].tolist() == [900]
+
+
+def test_date_only_end_includes_the_whole_day(snapshot_dir):
+    save_at(catalog(record('Tea', 10.0)), '2026-10-18T23:00:00')
+    save_at(catalog(record('Tea', 10.0)), '2026-10-19T18:30:00')
+    save_at(catalog(record('Tea', 10.0)), '2026-10-20T08:00:00')
+    assert snapshots.list_snapshots(start='2026-10-19', end='2026-10-19') == ['2026-10-19T183000.000000']
+
+
+def test_price_change_series_lists_each_change(snapshot_dir):
+    save_at(catalog(record('Tea', 10.0), record('Rice', 50.0)), '2026-10-19T09:00:00')
+    save_at(catalog(record('Tea', 10.0), record('Rice', 55.0)), '2026-10-19T10:00:00')
+    save_at(catalog(record('Tea', 10.0, discount=5.0), record('Rice', 55.0)), '2026-10-19T11:00:00')
+    series = snapshots.price_change_series()
+    assert series[['name_key', 'snapshot_id']].values.tolist() == [
+        ['rice', '2026-10-19T100000.000000'],
+        ['tea', '2026-10-19T110000.000000'],
+    ]
+    assert series.loc[0, 'prev_price_cents'] == 5000
+    assert series.loc[0, 'price_cents'] == 5500
+
+
+def test_stockout_periods_end_at_restock_and_at_gaps(snapshot_dir):
+    save_at(catalog(record('Tea', 10.0, stock=0), record('Rice', 50.0, stock=0)), '2026-10-19T09:00:00')
+    save_at(catalog(record('Tea', 10.0, stock=0), record('Rice', 50.0, stock=3)), '2026-10-19T10:00:00')
+    save_at(catalog(record('Rice', 50.0, stock=0)), '2026-10-19T11:00:00')
+    runs = snapshots.stockout_periods().set_index('name_key')
+    assert runs.loc['rice', 'snapshots'].tolist() == [1, 1]
+    assert runs.loc['rice', 'restocked_at'].iloc[0] == '2026-10-19T100000.000000'
+    assert pd.isna(runs.loc['rice', 'restocked_at'].iloc[1])
+    assert pd.isna(runs.loc['rice', 'removed_at']).all()
+    assert runs.loc['tea', 'snapshots'] == 2
+    assert pd.isna(runs.loc['tea', 'restocked_at'])
+    assert runs.loc['tea', 'removed_at'] == '2026-10-19T110000.000000'
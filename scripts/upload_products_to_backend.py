@@ -1,11 +1,15 @@
 import requests
 import pandas as pd
+import json
 import time
 import math
-# import openpyxl  # Only needed if used elsewhere in the script
+import openpyxl
 import sys
 import os
 
+import catalog_snapshots as snapshots
+
+BACKEND_BASE_URL = 'http://localhost:5000'
 BACKEND_URL = 'http://localhost:5000/api/products/bulk-upload'
 GET_PRODUCTS_URL = 'http://localhost:5000/api/products'
 DELETE_PRODUCT_URL = 'http://localhost:5000/api/products/{}'
@@ -13,86 +17,92 @@ ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Set your admin token as env varia
 FILE_PATH = '../data/products.xlsx'
 DROPPED_FILE = '../data/products_dropped_missing_name_or_category.xlsx'
 DEFAULT_CATEGORY_ID = '11111111-1111-1111-1111-111111111111'
+DEFAULT_CREATED_BY = 'a1b2c3d4-e5f6-7890-1234-567890abcdef'
+# GET /api/products hides soft-deleted products, so remember the ids we deactivate
+DEACTIVATED_IDS_FILE = '../data/products_deactivated.json'
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 FALLBACK_IMAGE = 'https://via.placeholder.com/400x400?text=No+Image'
 
 headers = {'Authorization': f'Bearer {ADMIN_TOKEN}'} if ADMIN_TOKEN else {}
 
-# Clean Excel file: fill NaN in required fields
-print('Cleaning Excel file...')
-df = pd.read_excel(FILE_PATH)
-if 'Current Stock' in df.columns:
-    df['Current Stock'] = df['Current Stock'].fillna(0).astype(int)
-if 'Sales Price' in df.columns:
-    df['Sales Price'] = df['Sales Price'].fillna(0).astype(float)
-if 'discount' in df.columns:
-    df['discount'] = df['discount'].fillna(0).astype(float)
-
-# Ensure 'name' column exists and is filled from 'Product Name' if needed
-if 'name' not in df.columns and 'Product Name' in df.columns:
-    df['name'] = df['Product Name']
-
-# Drop rows where 'name' is missing or blank
-if 'name' in df.columns:
-    before = len(df)
-    dropped_name = df[df['name'].isna() | (df['name'].astype(str).str.strip() == '')]
-    df = df[~(df['name'].isna() | (df['name'].astype(str).str.strip() == ''))]
-    after = len(df)
-    print(f"Dropped {before - after} rows with missing/blank name.")
-else:
-    print("Warning: 'name' column not found!")
-    dropped_name = pd.DataFrame()
-
-# Ensure 'category_id' column exists and fill missing/blank with default
-if 'category_id' not in df.columns:
-    print("'category_id' column not found, adding with default value.")
-    df['category_id'] = DEFAULT_CATEGORY_ID
-else:
-    missing_cat = df['category_id'].isna() | (df['category_id'].astype(str).str.strip() == '')
-    num_missing = missing_cat.sum()
-    if num_missing > 0:
-        print(f"Filling {num_missing} missing/blank category_id values with default.")
-        df.loc[missing_cat, 'category_id'] = DEFAULT_CATEGORY_ID
-
-# Ensure 'images' column is a comma-separated string and skip fallback/empty images
-if 'images' in df.columns:
-
-    def images_to_str(x):
-        if isinstance(x, list):
-            urls = [str(i) for i in x if pd.notna(i) and i != FALLBACK_IMAGE and i.strip() != '']
+
+def clean_products_excel():
+    # Clean Excel file: fill NaN in required fields
+    print('Cleaning Excel file...')
+    df = pd.read_excel(FILE_PATH)
+    if 'Current Stock' in df.columns:
+        df['Current Stock'] = df['Current Stock'].fillna(0).astype(int)
+    if 'Sales Price' in df.columns:
+        df['Sales Price'] = df['Sales Price'].fillna(0).astype(float)
+    if 'discount' in df.columns:
+        df['discount'] = df['discount'].fillna(0).astype(float)
+
+    # Ensure 'name' column exists and is filled from 'Product Name' if needed
+    if 'name' not in df.columns and 'Product Name' in df.columns:
+        df['name'] = df['Product Name']
+
+    # Drop rows where 'name' is missing or blank
+    if 'name' in df.columns:
+        before = len(df)
+        dropped_name = df[df['name'].isna() | (df['name'].astype(str).str.strip() == '')]
+        df = df[~(df['name'].isna() | (df['name'].astype(str).str.strip() == ''))]
+        after = len(df)
+        print(f"Dropped {before - after} rows with missing/blank name.")
+    else:
+        print("Warning: 'name' column not found!")
+        dropped_name = pd.DataFrame()
+
+    # Ensure 'category_id' column exists and fill missing/blank with default
+    if 'category_id' not in df.columns:
+        print("'category_id' column not found, adding with default value.")
+        df['category_id'] = DEFAULT_CATEGORY_ID
+    else:
+        missing_cat = df['category_id'].isna() | (df['category_id'].astype(str).str.strip() == '')
+        num_missing = missing_cat.sum()
+        if num_missing > 0:
+            print(f"Filling {num_missing} missing/blank category_id values with default.")
+            df.loc[missing_cat, 'category_id'] = DEFAULT_CATEGORY_ID
+
+    # Ensure 'images' column is a comma-separated string and skip fallback/empty images
+    if 'images' in df.columns:
+
+        def images_to_str(x):
+            if isinstance(x, list):
+                urls = [str(i) for i in x if pd.notna(i) and i != FALLBACK_IMAGE and i.strip() != '']
+                return ','.join(urls)
+            if pd.isna(x):
+                return ''
+            # If it's a string representation of a list, try to eval safely
+            if isinstance(x, str) and x.startswith('[') and x.endswith(']'):
+                try:
+                    import ast
+                    l = ast.literal_eval(x)
+                    if isinstance(l, list):
+                        urls = [str(i) for i in l if pd.notna(i) and i != FALLBACK_IMAGE and i.strip() != '']
+                        return ','.join(urls)
+                except Exception:
+                    pass
+            # If it's a comma-separated string, filter out fallback/empty
+            urls = [i for i in str(x).split(',') if i.strip() != '' and i != FALLBACK_IMAGE]
             return ','.join(urls)
-        if pd.isna(x):
-            return ''
-        # If it's a string representation of a list, try to eval safely
-        if isinstance(x, str) and x.startswith('[') and x.endswith(']'):
-            try:
-                import ast
-                l = ast.literal_eval(x)
-                if isinstance(l, list):
-                    urls = [str(i) for i in l if pd.notna(i) and i != FALLBACK_IMAGE and i.strip() != '']
-                    return ','.join(urls)
-            except Exception:
-                pass
-        # If it's a comma-separated string, filter out fallback/empty
-        urls = [i for i in str(x).split(',') if i.strip() != '' and i != FALLBACK_IMAGE]
-        return ','.join(urls)
-
-    df['images'] = df['images'].apply(images_to_str)
-
-    # Print a sample of the images column
-    sample_images = df['images'][df['images'].str.strip() != ''].head(10)
-    print('\nSample of non-empty images column:')
-    print(sample_images.to_string(index=False))
-    if sample_images.empty:
-        print('\nWARNING: All images are empty or fallback. No real image URLs will be uploaded.')
-else:
-    print("Warning: 'images' column not found!")
-
-# Save dropped rows for review (only those with missing/blank name)
-if not dropped_name.empty:
-    dropped_name.to_excel(DROPPED_FILE, index=False)
-    print(f"Saved dropped rows to {DROPPED_FILE}")
-
-df.to_excel(FILE_PATH, index=False)
+
+        df['images'] = df['images'].apply(images_to_str)
+
+        # Print a sample of the images column
+        sample_images = df['images'][df['images'].str.strip() != ''].head(10)
+        print('\nSample of non-empty images column:')
+        print(sample_images.to_string(index=False))
+        if sample_images.empty:
+            print('\nWARNING: All images are empty or fallback. No real image URLs will be uploaded.')
+    else:
+        print("Warning: 'images' column not found!")
+
+    # Save dropped rows for review (only those with missing/blank name)
+    if not dropped_name.empty:
+        dropped_name.to_excel(DROPPED_FILE, index=False)
+        print(f"Saved dropped rows to {DROPPED_FILE}")
+
+    df.to_excel(FILE_PATH, index=False)
 
 
 def delete_all_products():
@@ -148,15 +158,6 @@ def upload_products():
         print('Failed to upload products:', resp.status_code, resp.text)
 
 
-def main():
-    delete_all_products()
-    upload_products()
-
-
-if __name__ == '__main__':
-    main()
-
-
 def find_header_row_and_read_data(excel_path):
     # Use openpyxl to find the header row
     wb = openpyxl.load_workbook(excel_path, data_only=True)
@@ -176,12 +177,12 @@ def find_header_row_and_read_data(excel_path):
     return df
 
 
-def update_existing_product_price_discount(excel_path, backend_url, token):
-    print(f"Updating price and discount for existing products using {excel_path}...")
-    df = find_header_row_and_read_data(excel_path)
-    df['name_clean'] = df['Product Name'].astype(str).str.strip().str.lower()
+def build_catalog_records(df):
+    """Map each cleaned product name to the price/discount/stock we sync."""
     name_to_data = {}
     for _, row in df.iterrows():
+        if pd.isna(row['Product Name']) or str(row['Product Name']).strip() == '':
+            continue
         name_clean = str(row['Product Name']).strip().lower()
         # Price logic: use Sales Price
         price = row.get('Sales Price')
@@ -199,25 +200,94 @@ def update_existing_product_price_discount(excel_path, backend_url, token):
                 discount = 0
         except Exception:
             discount = 0
+        stock = row.get('Current Stock')
         name_to_data[name_clean] = {
+            'name': str(row['Product Name']).strip(),
             'price': float(price) if not pd.isna(price) else 0,
-            'discount': float(discount) if not pd.isna(discount) else 0
+            'discount': float(discount) if not pd.isna(discount) else 0,
+            'stock': int(stock) if stock is not None and not pd.isna(stock) else 0
         }
-    resp = requests.get(f"{backend_url}/api/products", headers={"Authorization": f"Bearer {token}"})
-    if resp.status_code == 401:
-        print("ERROR: Invalid or expired token. Please update ADMIN_TOKEN.")
-        return
-    resp.raise_for_status()
-    products = resp.json().get('products', resp.json())
+    return name_to_data
+
+
+def fetch_all_products(backend_url, token, page_size=100):
+    """Page through /api/products and return every active product."""
+    all_products = []
+    page = 1
+    while True:
+        resp = requests.get(
+            f"{backend_url}/api/products",
+            headers={"Authorization": f"Bearer {token}"},
+            params={'page': page, 'limit': page_size}
+        )
+        resp.raise_for_status()
+        products = resp.json().get('products', [])
+        all_products.extend(products)
+        if len(products) < page_size:
+            break
+        page += 1
+    return all_products
+
+
+def bulk_upload_file(path):
+    """POST an .xlsx to /api/products/bulk-upload; returns True on success."""
+    with open(path, 'rb') as f:
+        files = {'file': (os.path.basename(path), f, XLSX_MIME)}
+        resp = requests.post(BACKEND_URL, files=files, headers=headers)
+    if resp.status_code != 200:
+        print(f'Bulk upload of {path} failed: {resp.status_code} {resp.text}')
+        return False
+    return True
+
+
+def load_deactivated_ids():
+    """Map of cleaned name -> id for products these scripts soft-deleted."""
+    if not os.path.exists(DEACTIVATED_IDS_FILE):
+        return {}
+    with open(DEACTIVATED_IDS_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_deactivated_ids(ids):
+    tmp_path = DEACTIVATED_IDS_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(ids, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, DEACTIVATED_IDS_FILE)
+
+
+def update_existing_product_price_discount(excel_path, backend_url, token, only_changed=True):
+    """PUT price, discount and stock, by default only for rows that differ from the last synced state."""
+    print(f"Updating price, discount and stock for existing products using {excel_path}...")
+    df = find_header_row_and_read_data(excel_path)
+    name_to_data = build_catalog_records(df)
+    snapshot_id = snapshots.save_snapshot(name_to_data)
+    print(f"Recorded workbook as snapshot {snapshot_id}.")
+    # Diff against what the backend last accepted, not against the previous import
+    previous = snapshots.load_synced_state() if only_changed else None
+    if previous is None:
+        previous = snapshots.records_to_frame({})
+    diff = snapshots.diff_frames(previous, snapshots.records_to_frame(name_to_data))
+    to_push = set(diff.loc[diff['status'] != 'removed', 'name_key'])
+    print(f"{len(to_push)} products differ from the last synced state.")
+    try:
+        products = fetch_all_products(backend_url, token)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 401:
+            print("ERROR: Invalid or expired token. Please update ADMIN_TOKEN.")
+            return
+        raise
     updated, skipped = 0, 0
+    pushed = set()
     for prod in products:
         name_clean = prod['name'].strip().lower()
         prod_id = prod['id']
-        if name_clean in name_to_data:
+        if name_clean in to_push:
             data = name_to_data[name_clean]
             payload = {
                 'price': data['price'],
-                'discount': data['discount']
+                'discount': data['discount'],
+                'stock': data['stock'],
+                'isOutOfStock': data['stock'] == 0
             }
             put_resp = requests.put(
                 f"{backend_url}/api/products/{prod_id}",
@@ -226,12 +296,27 @@ def update_existing_product_price_discount(excel_path, backend_url, token):
             )
             if put_resp.status_code == 200:
                 updated += 1
+                pushed.add(name_clean)
             else:
                 print(f"Failed to update product {prod['name']} (id={prod_id}): {put_resp.text}")
+            time.sleep(0.05)
         else:
             skipped += 1
-        time.sleep(0.05)
-    print(f"Price/discount update complete. Updated: {updated}, Skipped: {skipped}")
+    # Keep the old values for rows that failed or aren't in the backend yet,
+    # so the next run pushes them again
+    synced = dict(name_to_data)
+    previous_records = snapshots.frame_to_records(previous)
+    # This path never deactivates products, so rows dropped from the workbook
+    # are still in the backend
+    for name_clean in diff.loc[diff['status'] == 'removed', 'name_key']:
+        synced[name_clean] = previous_records[name_clean]
+    for name_clean in to_push - pushed:
+        if name_clean in previous_records:
+            synced[name_clean] = previous_records[name_clean]
+        else:
+            del synced[name_clean]
+    snapshots.save_synced_state(synced)
+    print(f"Price/discount/stock update complete. Updated: {updated}, Skipped: {skipped}")
 
 
 def check_admin_token_valid(backend_url, token):
@@ -250,12 +335,30 @@ def check_admin_token_valid(backend_url, token):
         sys.exit(1)
 
 
-if __name__ == "__main__":
+def main():
     # Check admin token validity before any authenticated actions
-    check_admin_token_valid(backend_url="http://localhost:5000", token=ADMIN_TOKEN)
+    check_admin_token_valid(backend_url=BACKEND_BASE_URL, token=ADMIN_TOKEN)
+    if '--update-prices' in sys.argv[1:]:
+        # Incremental run: push only what changed since the last sync
+        update_existing_product_price_discount(
+            excel_path=FILE_PATH,
+            backend_url=BACKEND_BASE_URL,
+            token=ADMIN_TOKEN
+        )
+        return
+    clean_products_excel()
+    delete_all_products()
+    upload_products()
     # After upload, update price and discount for all products
     update_existing_product_price_discount(
         excel_path=FILE_PATH,
-        backend_url="http://localhost:5000",
-        token=ADMIN_TOKEN
-    ) 
+        backend_url=BACKEND_BASE_URL,
+        token=ADMIN_TOKEN,
+        # Every product was just re-created, so the last snapshot says nothing
+        # about what the backend holds now
+        only_changed=False
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+import os
+import sys
+import time
+import zipfile
+
+import pandas as pd
+import requests
+
+import catalog_snapshots as snapshots
+import enrich_products_with_images as enrich
+import upload_products_to_backend as upload
+
+WATCH_FILE = upload.FILE_PATH
+WATCH_UPLOAD_FILE = '../data/products_watch_upload.xlsx'
+POLL_INTERVAL = 1.0
+# The billing export rewrites the workbook in several chunks; wait until it
+# has stopped changing for this long before reading it
+DEBOUNCE_SECONDS = 3.0
+# Backoff between retries while the backend rejects rows or is unreachable
+RETRY_MIN_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+SYNC_FIELDS = ['price', 'discount', 'stock']
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def wait_until_stable(path, debounce=DEBOUNCE_SECONDS):
+    """Block until the file signature is unchanged for `debounce` seconds."""
+    signature = file_signature(path)
+    stable_since = time.monotonic()
+    while time.monotonic() - stable_since < debounce:
+        time.sleep(POLL_INTERVAL)
+        current = file_signature(path)
+        if current != signature:
+            signature = current
+            stable_since = time.monotonic()
+    return signature
+
+
+def read_catalog(path):
+    # A half-written .xlsx is a truncated zip; report it so the caller retries
+    try:
+        df = upload.find_header_row_and_read_data(path)
+    except (zipfile.BadZipFile, EOFError, KeyError, OSError) as e:
+        print(f'Workbook not readable yet ({e}); waiting for the writer to finish.')
+        return None
+    except ValueError as e:
+        # Valid workbook without a "Product Name" header row, e.g. a partial export
+        print(f'Workbook has no usable header row yet ({e}); will retry.')
+        return None
+    return upload.build_catalog_records(df)
+
+
+def load_last_synced():
+    synced = snapshots.load_synced_state()
+    if synced is None:
+        return None
+    return snapshots.frame_to_records(synced)
+
+
+def diff_catalog(previous, current):
+    """Return (added, changed, removed) name keys between two catalog snapshots."""
+    diff = snapshots.diff_frames(
+        snapshots.records_to_frame(previous), snapshots.records_to_frame(current)
+    )
+    keys = diff.groupby('status')['name_key'].agg(list)
+    return keys.get('added', []), keys.get('changed', []), keys.get('removed', [])
+
+
+def build_new_products_frame(records, index):
+    rows = []
+    for record in records:
+        match, score, image_url = enrich.match_product_name(record['name'], index)
+        if score < enrich.LOW_CONFIDENCE_SCORE or '/invalid/' in str(image_url) or not str(image_url).strip():
+            image_url = enrich.DEFAULT_IMAGE_URL
+        rows.append({
+            'name': record['name'],
+            'description': '',
+            'price': record['price'],
+            'discount': record['discount'],
+            'stock': record['stock'],
+            'images': image_url,
+            'isOutOfStock': record['stock'] == 0,
+            'isActive': True,
+            'categoryId': upload.DEFAULT_CATEGORY_ID,
+            # Without this the backend falls back to an id that isn't a user
+            'createdBy': upload.DEFAULT_CREATED_BY,
+        })
+    return pd.DataFrame(rows)
+
+
+def upload_new_products(records, index):
+    df = build_new_products_frame(records, index)
+    df.to_excel(WATCH_UPLOAD_FILE, index=False)
+    return upload.bulk_upload_file(WATCH_UPLOAD_FILE)
+
+
+def put_product(prod_id, payload):
+    resp = requests.put(
+        f'{upload.BACKEND_BASE_URL}/api/products/{prod_id}',
+        json=payload,
+        headers=upload.headers
+    )
+    if resp.status_code != 200:
+        print(f'Failed to update product id={prod_id}: {resp.status_code} {resp.text}')
+        return False
+    return True
+
+
+def delete_product(prod_id):
+    resp = requests.delete(upload.DELETE_PRODUCT_URL.format(prod_id), headers=upload.headers)
+    if resp.status_code != 200:
+        print(f'Failed to delete product id={prod_id}: {resp.status_code} {resp.text}')
+        return False
+    return True
+
+
+def sync_payload(record):
+    payload = {field: record[field] for field in SYNC_FIELDS}
+    payload['isOutOfStock'] = record['stock'] == 0
+    return payload
+
+
+def push_changes(previous, current, index):
+    """Push only the affected products; return the catalog state now in the backend."""
+    added, changed, removed = diff_catalog(previous, current)
+    print(f'Diff: {len(added)} added, {len(changed)} changed, {len(removed)} removed.')
+    synced = dict(previous)
+    if not (added or changed or removed):
+        return synced
+    backend_ids = {
+        str(p['name']).strip().lower(): p['id']
+        for p in upload.fetch_all_products(upload.BACKEND_BASE_URL, upload.ADMIN_TOKEN)
+    }
+    deactivated = upload.load_deactivated_ids()
+
+    # A name already in the backend is an update even if our snapshot missed it;
+    # one we soft-deleted earlier is reactivated rather than created again
+    inactive = [name for name in changed + added if name not in backend_ids]
+    to_update = [name for name in changed + added if name in backend_ids]
+    to_reactivate = [name for name in inactive if name in deactivated]
+    to_create = [name for name in added if name not in backend_ids and name not in deactivated]
+    missing = [name for name in changed if name not in backend_ids and name not in deactivated]
+
+    for name in to_update:
+        if put_product(backend_ids[name], sync_payload(current[name])):
+            synced[name] = current[name]
+
+    for name in to_reactivate:
+        payload = sync_payload(current[name])
+        payload['isActive'] = True
+        if put_product(deactivated[name], payload):
+            synced[name] = current[name]
+            del deactivated[name]
+
+    for name in missing:
+        # Deactivated outside these scripts (e.g. in the admin panel); leave it
+        # that way instead of retrying it on every cycle
+        print(f'Product {current[name]["name"]} is not active in the backend; not updating it.')
+        synced[name] = current[name]
+
+    if to_create and upload_new_products([current[name] for name in to_create], index):
+        for name in to_create:
+            synced[name] = current[name]
+
+    for name in removed:
+        prod_id = backend_ids.get(name)
+        if prod_id is None:
+            synced.pop(name, None)
+        elif delete_product(prod_id):
+            synced.pop(name, None)
+            deactivated[name] = prod_id
+
+    upload.save_deactivated_ids(deactivated)
+    return synced
+
+
+def run_cycle(index, previous, current, saved_at):
+    """Push one stable version of the workbook.
+
+    Returns (synced, complete). `complete` is False when the backend was
+    unreachable or rejected some rows, so the caller should retry.
+    """
+    cycle_start = time.time()
+    try:
+        synced = push_changes(previous, current, index)
+    except requests.RequestException as e:
+        print(f'Backend request failed ({e}); will retry.')
+        return previous, False
+    # Rows the backend rejected keep their old values so the retry pushes them again
+    snapshots.save_synced_state(synced)
+    done = time.time()
+    pending = sum(len(keys) for keys in diff_catalog(synced, current))
+    status = f'incomplete, {pending} products not synced yet; will retry' if pending else 'complete'
+    print(
+        f'Cycle {status}: {len(current)} products in workbook. '
+        f'Latency save→backend {done - saved_at:.2f}s '
+        f'(debounce {cycle_start - saved_at:.2f}s, diff+push {done - cycle_start:.2f}s)'
+    )
+    return synced, not pending
+
+
+def watch():
+    print(f'Watching {WATCH_FILE} for changes (debounce {DEBOUNCE_SECONDS}s)...')
+    enrich.download_dataset()
+    index = enrich.build_match_index(enrich.load_external_dataset())
+    previous = load_last_synced()
+    if previous is None:
+        print(f'No {snapshots.SYNCED_STATE_FILE} yet; run with --baseline first to avoid re-pushing the whole catalog.')
+        previous = {}
+    last_signature = None
+    recorded_signature = None
+    retry_delay = RETRY_MIN_SECONDS
+    while True:
+        signature = file_signature(WATCH_FILE)
+        if signature is None or signature == last_signature:
+            time.sleep(POLL_INTERVAL)
+            continue
+        # A retry of an already recorded version doesn't need to debounce again
+        if signature != recorded_signature:
+            signature = wait_until_stable(WATCH_FILE)
+            if signature is None:
+                print(f'{WATCH_FILE} disappeared; waiting for it to come back.')
+                continue
+        current = read_catalog(WATCH_FILE)
+        if current is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        if signature != recorded_signature:
+            snapshot_id = snapshots.save_snapshot(current)
+            recorded_signature = signature
+            print(f'Recorded workbook as snapshot {snapshot_id}.')
+        previous, complete = run_cycle(index, previous, current, signature[0] / 1e9)
+        if complete:
+            last_signature = signature
+            retry_delay = RETRY_MIN_SECONDS
+        else:
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, RETRY_MAX_SECONDS)
+
+
+def record_baseline():
+    records = read_catalog(WATCH_FILE)
+    if records is None:
+        sys.exit(1)
+    snapshot_id = snapshots.save_snapshot(records)
+    snapshots.save_synced_state(records)
+    print(f'Recorded {len(records)} products as snapshot {snapshot_id} and marked them synced.')
+
+
+def main():
+    if '--baseline' in sys.argv[1:]:
+        record_baseline()
+        return
+    upload.check_admin_token_valid(backend_url=upload.BACKEND_BASE_URL, token=upload.ADMIN_TOKEN)
+    try:
+        watch()
+    except KeyboardInterrupt:
+        print('Stopped watching.')
+
+
+if __name__ == '__main__':
+    main()